@@ -0,0 +1,153 @@
+'''
+Structures used by the scraper in low memory mode, so that memory use stays
+flat however many tracks have been scraped before or are left to scrape
+'''
+import hashlib
+import math
+import sqlite3
+import tempfile
+
+CHUNK_SIZE = 10000  # number of rows read from the store at a time
+
+class LinkFrontier:
+    '''
+    This class keeps the links left to visit in a temporary file on disk instead of a list
+    Links can be appended while the frontier is being iterated over
+    The temporary file is deleted once the frontier is closed or garbage collected
+    '''
+    def __init__(self):
+        self.file = tempfile.TemporaryFile(mode='w+', encoding='utf-8')
+        self.count = 0
+
+    def append(self, link: str) -> None:
+        '''
+        This method adds a link to the end of the frontier
+
+        Parameters
+        ----------
+        link: str
+            The link to add
+        '''
+        self.file.seek(0, 2)
+        self.file.write(link + '\n')
+        self.count += 1
+
+    def __iter__(self):
+        position = 0
+        while True:
+            self.file.seek(position)
+            line = self.file.readline()
+            if not line:
+                return
+            position = self.file.tell()
+            yield line.rstrip('\n')
+
+    def __len__(self) -> int:
+        return self.count
+
+    def close(self) -> None:
+        self.file.close()
+
+class BloomFilter:
+    '''
+    This class is a compact set of strings that can tell for sure when a string was never added
+    A positive answer might be wrong with a probability of error_rate, so it
+    has to be confirmed against the store the strings came from
+
+    Parameters
+    ----------
+    capacity: int
+        The number of strings expected to be added
+    error_rate: float
+        The acceptable probability of a false positive
+    '''
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        capacity = max(capacity, 1)
+        self.size = max(int(-capacity * math.log(error_rate) / math.log(2) ** 2), 8)
+        self.hash_count = max(round(self.size / capacity * math.log(2)), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def positions(self, value: str):
+        '''
+        This method yields the bit positions of a string using double hashing
+
+        Parameters
+        ----------
+        value: str
+            The string to hash
+        '''
+        digest = hashlib.blake2b(value.encode('utf-8'), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.hash_count):
+            yield (first + i * second) % self.size
+
+    def add(self, value: str) -> None:
+        for position in self.positions(value):
+            self.bits[position // 8] |= 1 << (position % 8)
+
+    def __contains__(self, value: str) -> bool:
+        return all(self.bits[position // 8] & (1 << (position % 8))
+            for position in self.positions(value))
+
+class LocalTrackIndex:
+    '''
+    This class keeps the friendly id and title of every track saved in local storage
+    in a small sqlite file, so a track can be looked up by friendly id with a single read
+    instead of opening every data.json file
+
+    Parameters
+    ----------
+    path: str
+        The path to the sqlite file
+    '''
+    def __init__(self, path: str):
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS tracks '
+            '(friendly_id TEXT PRIMARY KEY, track_title TEXT)')
+
+    def add(self, friendly_id: str, track_title: str) -> None:
+        '''
+        This method records a saved track, replacing any track with the same friendly id
+
+        Parameters
+        ----------
+        friendly_id: str
+            The friendly_id of the track
+        track_title: str
+            The title of the track
+        '''
+        self.connection.execute('INSERT OR REPLACE INTO tracks VALUES (?, ?)',
+            (friendly_id, track_title))
+
+    def clear(self) -> None:
+        '''
+        This method removes every track from the index, so it can be rebuilt
+        from the tracks currently in local storage
+        '''
+        self.connection.execute('DELETE FROM tracks')
+
+    def commit(self) -> None:
+        self.connection.commit()
+
+    def track_title(self, friendly_id: str) -> str:
+        '''
+        This method looks up the title of a saved track
+
+        Parameters
+        ----------
+        friendly_id: str
+            The friendly_id of the track
+
+        Returns
+        -------
+        track_title: str
+            The title of the track, or None if no track with this friendly id was saved
+        '''
+        row = self.connection.execute('SELECT track_title FROM tracks WHERE friendly_id = ?',
+            (friendly_id,)).fetchone()
+        return row[0] if row else None
+
+    def close(self) -> None:
+        self.connection.commit()
+        self.connection.close()
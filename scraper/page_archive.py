@@ -0,0 +1,260 @@
+'''
+Append-only archive of the raw HTML of every page fetched by the scraper,
+so that extraction can be replayed offline after the xpaths in config.py change
+'''
+from datetime import datetime, timezone
+import gzip
+import json
+from lxml import html as lxml_html
+import os
+import re
+from selenium.common.exceptions import NoSuchElementException
+from selenium.webdriver.common.by import By
+import uuid
+
+SEGMENT_SIZE = 100 * 1024 * 1024  # start a new segment once the current one reaches 100MB
+BLOCK_TAGS = {'address', 'article', 'aside', 'blockquote', 'dd', 'div', 'dl', 'dt',
+    'fieldset', 'figcaption', 'figure', 'footer', 'form', 'h1', 'h2', 'h3', 'h4', 'h5',
+    'h6', 'header', 'hr', 'li', 'main', 'nav', 'ol', 'p', 'pre', 'section', 'table',
+    'tr', 'ul'}
+HIDDEN_TAGS = {'head', 'noscript', 'script', 'style', 'template', 'title'}
+HIDDEN_STYLE = re.compile(r'(display\s*:\s*none|visibility\s*:\s*hidden)')
+
+class PageArchive:
+    '''
+    This class stores fetched pages as WARC-style records in gzip compressed segments.
+    Each record is compressed as a separate gzip member so it can be read on its own,
+    and an index file keeps the url, fetch time and location of every record
+
+    Parameters
+    ----------
+    folder: str
+        The folder in which the segments and the index are kept
+    segment_size: int
+        The size in bytes after which a new segment is started
+
+    Attribute
+    ---------
+    index_path: str
+        The path to the index file of the archive
+    '''
+    def __init__(self, folder: str, segment_size: int = SEGMENT_SIZE):
+        self.folder = folder
+        self.segment_size = segment_size
+        self.index_path = os.path.join(folder, 'index.jsonl')
+
+    def current_segment(self) -> str:
+        '''
+        This method returns the name of the segment new records are appended to
+        If the latest segment is full, the name of a new segment is returned
+
+        Returns
+        -------
+        segment: str
+            The file name of the segment inside the archive folder
+        '''
+        if not os.path.exists(self.folder):
+            os.makedirs(self.folder)
+        segments = sorted(name for name in os.listdir(self.folder)
+                if name.endswith('.warc.gz'))
+        if not segments:
+            return 'segment-00000.warc.gz'
+        latest = segments[-1]
+        if os.path.getsize(os.path.join(self.folder, latest)) < self.segment_size:
+            return latest
+        number = int(latest.split('-')[1].split('.')[0]) + 1
+        return f'segment-{number:05d}.warc.gz'
+
+    def append(self, url: str, page_source: str, **metadata) -> dict:
+        '''
+        This method appends a page to the archive and records it in the index
+
+        Parameters
+        ----------
+        url: str
+            The url the page was fetched from
+        page_source: str
+            The HTML of the page
+        metadata:
+            Any extra values to keep in the index entry of the page (e.g. UUID, Ranking)
+
+        Returns
+        -------
+        entry: dict
+            The index entry written for the page
+        '''
+        fetched_at = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+        body = page_source.encode('utf-8')
+        header = ('WARC/1.0\r\n'
+            'WARC-Type: resource\r\n'
+            f'WARC-Record-ID: <urn:uuid:{uuid.uuid4()}>\r\n'
+            f'WARC-Target-URI: {url}\r\n'
+            f'WARC-Date: {fetched_at}\r\n'
+            'Content-Type: text/html; charset=utf-8\r\n'
+            f'Content-Length: {len(body)}\r\n'
+            '\r\n').encode('utf-8')
+        record = gzip.compress(header + body + b'\r\n\r\n')
+        segment = self.current_segment()
+        with open(os.path.join(self.folder, segment), 'ab') as f:
+            offset = f.tell()
+            f.write(record)
+        entry = {'url': url, 'fetched_at': fetched_at, 'segment': segment,
+            'offset': offset, 'length': len(record), **metadata}
+        with open(self.index_path, 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+        return entry
+
+    def entries(self):
+        '''
+        This method yields the index entries of the archive one at a time
+        It raises FileNotFoundError if the folder does not contain an archive
+
+        Yields
+        ------
+        entry: dict
+            The index entry of an archived page
+        '''
+        with open(self.index_path, 'r') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def read(self, entry: dict) -> str:
+        '''
+        This method reads the HTML of an archived page
+
+        Parameters
+        ----------
+        entry: dict
+            The index entry of the page
+
+        Returns
+        -------
+        page_source: str
+            The HTML of the page as it was fetched
+        '''
+        with open(os.path.join(self.folder, entry['segment']), 'rb') as f:
+            f.seek(entry['offset'])
+            record = gzip.decompress(f.read(entry['length']))
+        header, body = record.split(b'\r\n\r\n', 1)
+        for line in header.decode('utf-8').split('\r\n'):
+            if line.startswith('Content-Length:'):
+                body = body[:int(line.split(':', 1)[1])]
+        return body.decode('utf-8')
+
+class ArchivedElement:
+    '''
+    This class wraps an lxml element so it can be searched the same way
+    as a webdriver element
+
+    Parameters
+    ----------
+    element:
+        The lxml element to wrap
+    '''
+    def __init__(self, element):
+        self.element = element
+
+    @property
+    def text(self) -> str:
+        '''
+        The text of the element rendered the way Selenium renders it: text inside
+        script, style and hidden elements is left out, block elements and <br> start
+        a new line, and whitespace is collapsed and stripped on every line
+        Elements hidden through a stylesheet cannot be detected without a browser
+        so their text is kept
+        '''
+        pieces = []
+        self.render(self.element, pieces)
+        lines = (line.strip() for line in ''.join(pieces).split('\n'))
+        return '\n'.join(line for line in lines if line)
+
+    def render(self, element, pieces: list) -> None:
+        '''
+        This method appends the rendered text of an element and its children to pieces
+
+        Parameters
+        ----------
+        element:
+            The lxml element to render
+        pieces: list
+            The list of text pieces, in which newlines mark line breaks
+        '''
+        if not isinstance(element.tag, str):  # comments and processing instructions
+            return
+        tag = element.tag.lower()
+        if (tag in HIDDEN_TAGS or element.get('hidden') is not None
+                or HIDDEN_STYLE.search(element.get('style', ''))):
+            return
+        if tag in BLOCK_TAGS or tag == 'br':
+            pieces.append('\n')
+        if element.text:
+            pieces.append(re.sub(r'\s+', ' ', element.text))
+        for child in element:
+            self.render(child, pieces)
+            if child.tail:
+                pieces.append(re.sub(r'\s+', ' ', child.tail))
+        if tag in BLOCK_TAGS:
+            pieces.append('\n')
+
+    def get_attribute(self, name: str) -> str:
+        return self.element.get(name)
+
+    def find_elements(self, by: str, value: str) -> list:
+        '''
+        This method finds all elements matching the locator
+
+        Parameters
+        ----------
+        by: str
+            The locator strategy, one of By.XPATH, By.CLASS_NAME and By.TAG_NAME
+        value: str
+            The xpath, class name or tag name to look for
+
+        Returns
+        -------
+        elements: list
+            A list of ArchivedElement objects, empty if nothing was found
+        '''
+        if by == By.XPATH:
+            xpath = value
+        elif by == By.CLASS_NAME:
+            xpath = f'.//*[contains(concat(" ", normalize-space(@class), " "), " {value} ")]'
+        elif by == By.TAG_NAME:
+            xpath = f'.//{value}'
+        else:
+            raise ValueError(f'Locator {by} is not supported for archived pages')
+        return [ArchivedElement(element) for element in self.element.xpath(xpath)]
+
+    def find_element(self, by: str, value: str):
+        '''
+        This method finds the first element matching the locator
+
+        Parameters
+        ----------
+        by: str
+            The locator strategy, one of By.XPATH, By.CLASS_NAME and By.TAG_NAME
+        value: str
+            The xpath, class name or tag name to look for
+
+        Returns
+        -------
+        element: ArchivedElement
+            The first element found
+        '''
+        elements = self.find_elements(by, value)
+        if not elements:
+            raise NoSuchElementException(f'No element found for {by} {value}')
+        return elements[0]
+
+class ArchivedPage(ArchivedElement):
+    '''
+    This class stands in for the webdriver when extracting data from an archived page
+
+    Parameters
+    ----------
+    page_source: str
+        The HTML of the archived page
+    '''
+    def __init__(self, page_source: str):
+        super().__init__(lxml_html.document_fromstring(page_source))
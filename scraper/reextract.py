@@ -0,0 +1,122 @@
+'''
+Runs the track extraction again over the pages kept in the raw_pages archive,
+in parallel and without opening a browser or using the network
+
+Usage: python scraper/reextract.py [--archive raw_pages] [--output reextracted.jsonl]
+                                   [--store local|rds] [--workers N]
+'''
+import argparse
+from functools import partial
+import json
+from multiprocessing import Pool
+import os
+from page_archive import PageArchive
+from scraper import OfflineBeatportScraper
+
+def extract_entry(folder: str, entry: dict) -> tuple:
+    '''
+    This function extracts the track data of a single archived page
+
+    Parameters
+    ----------
+    folder: str
+        The folder of the archive
+    entry: dict
+        The index entry of the page
+
+    Returns
+    -------
+    result: tuple
+        The index entry, the extracted track data (None if extraction failed)
+        and the error message (None if extraction succeeded)
+    '''
+    try:
+        page_source = PageArchive(folder).read(entry)
+        data = OfflineBeatportScraper(page_source).extract_archived_track(entry)
+        return entry, data, None
+    except Exception as e:
+        return entry, None, repr(e)
+
+def track_entries(archive: PageArchive):
+    '''
+    This function yields the index entries of the archived track websites,
+    skipping other pages such as the Top 100 page
+
+    Parameters
+    ----------
+    archive: PageArchive
+        The archive to read the entries from
+
+    Yields
+    ------
+    entry: dict
+        The index entry of an archived track website
+    '''
+    for entry in archive.entries():
+        if entry.get('kind', 'track') == 'track':
+            yield entry
+
+def reextract_archive(folder: str, output: str = None, store: str = None,
+    workers: int = None) -> int:
+    '''
+    This function extracts the track data of every track website in the archive.
+    The data is written to the output file, one JSON object per line, and/or back to
+    the store it was scraped to, replacing the data saved under the same UUID
+
+    Parameters
+    ----------
+    folder: str
+        The folder of the archive
+    output: str
+        The path of the JSON lines file to write the extracted data to
+        If None, no file is written
+    store: str
+        Either 'local' or 'rds' to write the data back to that store
+        If None, the store is left untouched
+    workers: int
+        The number of processes to use. If None, one per CPU core is used
+
+    Returns
+    -------
+    extracted: int
+        The number of pages the data was extracted from successfully
+    '''
+    archive = PageArchive(folder)
+    if not os.path.exists(archive.index_path):
+        raise FileNotFoundError(f'No page archive found in {folder}')
+    if store is not None:
+        backfill = OfflineBeatportScraper()
+        backfill.initialise_backfill(store_locally=store == 'local')
+    extracted = 0
+    f = open(output, 'w') if output else None
+    try:
+        with Pool(workers) as pool:
+            results = pool.imap(partial(extract_entry, folder), track_entries(archive),
+                chunksize=16)
+            for entry, data, error in results:
+                if error:
+                    print(f'Could not extract {entry["url"]}: {error}')
+                    continue
+                if store is not None:
+                    backfill.backfill_track(data)
+                if f:
+                    f.write(json.dumps({**data, 'Fetched_At': entry['fetched_at']}) + '\n')
+                extracted += 1
+    finally:
+        if f:
+            f.close()
+    return extracted
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Extract track data from archived pages')
+    parser.add_argument('--archive', default=os.path.join(os.getcwd(), 'raw_pages'))
+    parser.add_argument('--output', default=None,
+        help='JSON lines file to write the data to (default reextracted.jsonl without --store)')
+    parser.add_argument('--store', choices=['local', 'rds'], default=None,
+        help='write the data back to the local raw_data folder or the RDS, keyed by UUID')
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+    if args.output is None and args.store is None:
+        args.output = 'reextracted.jsonl'
+    count = reextract_archive(args.archive, args.output, args.store, args.workers)
+    print(f'Extracted {count} tracks')
@@ -1,8 +1,10 @@
 import boto3
 import config
 import json
+from low_memory import BloomFilter, CHUNK_SIZE, LinkFrontier, LocalTrackIndex
 from multiprocessing.dummy.connection import Client
 import os
+from page_archive import ArchivedPage, PageArchive
 import pandas as pd
 from requests.api import options
 from selenium import webdriver
@@ -19,7 +21,7 @@ from selenium.webdriver.firefox.options import Options as FirefoxOptions
 from selenium.webdriver.firefox.service import Service as FirefoxService
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.future.engine import Engine
 import tempfile
 import time
@@ -315,13 +317,21 @@ class BeatportScraper(Scraper):
     chrome: bool
         If the default value=True is used, Chrome browser is used
         If chome is set to False, Firefox is used
+    low_memory: bool
+        If True, the track links are kept in a file on disk and the already scraped
+        tracks are checked against a Bloom filter instead of lists held in memory
     '''
-    def __init__(self, chrome: bool = True, url: str = config.URL):
+    mapping_dict = {0:'Length', 1:'Released', 2:'BPM', 3:'Key', 4:'Genre', 5:'Label'}
+
+    def __init__(self, chrome: bool = True, url: str = config.URL, low_memory: bool = False):
         super().__init__(url, chrome)
         self.accept_cookies(config.ACCEPT_COOKIES)
         self.close_ads(config.CLOSE_ADS)
-        self.trackdict = {'Track_Link': [] }
-        self.mapping_dict = {0:'Length', 1:'Released', 2:'BPM', 3:'Key', 4:'Genre', 5:'Label'}
+        self.low_memory = low_memory
+        if low_memory:
+            self.trackdict = {'Track_Link': LinkFrontier() }
+        else:
+            self.trackdict = {'Track_Link': [] }
 
     def click_top_100(self, xpath: str) -> None:
         '''
@@ -373,6 +383,7 @@ class BeatportScraper(Scraper):
         and reads the friendly_ids and track_titles of already scraped tracks
         For online mode it connects to the RDS and S3 and keeps track of the friendly
         ids and track_titles of already scraped tracks
+        In low memory mode only a Bloom filter of the friendly_ids is kept
 
         Parameters
         ----------
@@ -381,13 +392,19 @@ class BeatportScraper(Scraper):
         '''
         if store_locally:
             self.store_locally = True
-            parent_directory = self.create_track_folder()
-            self.find_locally_scraped_tracks(parent_directory)
+            self.parent_directory = self.create_track_folder()
+            if self.low_memory:
+                self.index_locally_scraped_tracks(self.parent_directory)
+            else:
+                self.find_locally_scraped_tracks(self.parent_directory)
         else:
             self.store_locally = False
             self.engine = self.connect_engine()
             self.client = self.connect_s3_client()
-            self.find_online_scraped_tracks()
+            if self.low_memory:
+                self.index_online_scraped_tracks()
+            else:
+                self.find_online_scraped_tracks()
         
     def create_current_track_data_dict(self) -> None:
         '''
@@ -505,6 +522,8 @@ class BeatportScraper(Scraper):
         self.friendly_id_scraped_local = []
         self.track_titles_scraped_local = []
         for folder in os.listdir(parent_directory):
+            if not os.path.isdir(os.path.join(parent_directory, folder)):
+                continue  # e.g. the low memory friendly id index
             data_path = os.path.join(parent_directory, folder, 'data.json')
             f = open(data_path)
             data = json.load(f)
@@ -525,11 +544,81 @@ class BeatportScraper(Scraper):
             self.friendly_id_scraped = []
             self.track_titles_scraped = []
 
+    def index_locally_scraped_tracks(self, parent_directory: str) -> None:
+        '''
+        This method adds the friendly id of every track already scraped in local
+        storage to a Bloom filter, reading one data.json file at a time
+        It also rebuilds the friendly_ids.sqlite index in the raw_data folder,
+        which is used to confirm the matches of the Bloom filter
+
+        Parameters
+        ----------
+        parent_directory: str
+            The path to the raw_data folder created
+        '''
+        count = sum(1 for folder in os.scandir(parent_directory) if folder.is_dir())
+        self.scraped_filter = BloomFilter(count)
+        self.local_index = LocalTrackIndex(os.path.join(parent_directory, 'friendly_ids.sqlite'))
+        self.local_index.clear()
+        for folder in os.scandir(parent_directory):
+            if not folder.is_dir():
+                continue
+            with open(os.path.join(folder.path, 'data.json')) as f:
+                data = json.load(f)
+            self.scraped_filter.add(data['Friendly_ID'])
+            self.local_index.add(data['Friendly_ID'], data['Track_Title'])
+        self.local_index.commit()
+
+    def index_online_scraped_tracks(self) -> None:
+        '''
+        This method adds the friendly id of every track already scraped on the
+        cloud to a Bloom filter, streaming the ids from the RDS in chunks
+        It also makes sure Friendly_ID is indexed, so that confirming a match of the
+        Bloom filter does not scan the whole track_data table
+        '''
+        if not inspect(self.engine).has_table('track_data'):
+            print('First time storing in this RDS')
+            self.scraped_filter = BloomFilter(0)
+            return
+        with self.engine.begin() as conn:
+            conn.execute(text('CREATE INDEX IF NOT EXISTS track_data_friendly_id '
+                'ON track_data ("Friendly_ID")'))
+        with self.engine.connect() as conn:
+            count = conn.execute(text('SELECT COUNT(*) FROM track_data')).scalar()
+            self.scraped_filter = BloomFilter(count)
+            chunks = pd.read_sql(text('SELECT "Friendly_ID" FROM track_data'),
+                conn.execution_options(stream_results=True), chunksize=CHUNK_SIZE)
+            for chunk in chunks:
+                for friendly_id in chunk['Friendly_ID']:
+                    self.scraped_filter.add(friendly_id)
+
+    def find_scraped_track_title(self, friendly_id: str) -> str:
+        '''
+        This method looks up the title of an already scraped track in the store
+        It is used in low memory mode to confirm a match of the Bloom filter
+
+        Parameters
+        ----------
+        friendly_id: str
+            The friendly_id of the track to look for
+
+        Returns
+        -------
+        track_title: str
+            The title of the track, or None if the track was not scraped before
+        '''
+        if self.store_locally:
+            return self.local_index.track_title(friendly_id)
+        with self.engine.connect() as conn:
+            return conn.execute(text('SELECT "Track_Title" FROM track_data '
+                'WHERE "Friendly_ID" = :friendly_id LIMIT 1'),
+                {'friendly_id': friendly_id}).scalar()
 
     def check_if_already_scraped(self, friendly_id: str) -> bool:
         '''
         This method, depending on where the data set to be stored, checks if the
         friendly_id provided exists in the list of already scraped tracks
+        In low memory mode the Bloom filter is checked first and a match is confirmed in the store
         If it is found, it prints out a message that says the title of the song that 
         was scraped as well as where it was found. Additionally it outputs a variable
         with the value True denoting that it was indeed scraped before
@@ -546,15 +635,24 @@ class BeatportScraper(Scraper):
             A boolean value which is True if the track was already scraped and False if not
         '''
         if self.store_locally:
-            friendly_ids = self.friendly_id_scraped_local
-            track_titles = self.track_titles_scraped_local
             location = 'local storage'
         else:
-            friendly_ids = self.friendly_id_scraped
-            track_titles = self.track_titles_scraped
             location = 'RDS'
-        if friendly_id in friendly_ids:
-            name = track_titles[friendly_ids.index(friendly_id)]
+        if self.low_memory:
+            name = None
+            if friendly_id in self.scraped_filter:
+                name = self.find_scraped_track_title(friendly_id)
+        else:
+            if self.store_locally:
+                friendly_ids = self.friendly_id_scraped_local
+                track_titles = self.track_titles_scraped_local
+            else:
+                friendly_ids = self.friendly_id_scraped
+                track_titles = self.track_titles_scraped
+            name = None
+            if friendly_id in friendly_ids:
+                name = track_titles[friendly_ids.index(friendly_id)]
+        if name is not None:
             print(f'{name} already scraped in {location}')
             scraped = True
         else:
@@ -572,11 +670,14 @@ class BeatportScraper(Scraper):
             track_folder = self.create_track_folder(self.current_track_data['Track_Title']) # create sub folder
             self.save_data(track_folder, self.current_track_data)
             self.save_image_local(track_folder, self.current_track_data['Track_Title'], self.current_track_data['Artwork_Link'])
+            if self.low_memory:
+                self.local_index.add(self.current_track_data['Friendly_ID'], self.current_track_data['Track_Title'])
+                self.local_index.commit()
         else:
             self.upload_images_to_s3(self.current_track_data['Artwork_Link'], self.current_track_data['Track_Title'])
             self.save_data_to_rds(self.current_track_data)
 
-    def scrape_data(self, store_locally=False) -> None:
+    def scrape_data(self, store_locally=False, archive_pages=False) -> None:
         '''
         This method scrapes data from the track websites visited
         After it finishes scraping, it closes the web browser
@@ -586,34 +687,147 @@ class BeatportScraper(Scraper):
         store_locally: bool
             Whether to store scraped data locally or on the cloud
             If nothing is passed as an argument, scraper stores data on the cloud
+        archive_pages: bool
+            Whether to keep the HTML of every track website visited in the raw_pages
+            archive, so the data can be extracted again later without the network
+            The Top 100 page the track links are taken from is archived as well
         '''
+        if archive_pages:
+            self.archive = PageArchive(os.path.join(os.getcwd(), 'raw_pages'))
+        else:
+            self.archive = None
         self.click_top_100(config.CLICK_TOP_100)
         self.find_container_and_get_track_links(config.CONTAINER)
+        if self.archive:
+            self.archive.append(self.driver.current_url, self.driver.page_source,
+                kind='top_100')
         self.initialise_saving_method(store_locally)
         self.rank = 1  # initialize rank
-        for link in self.trackdict['Track_Link']:
-            friendly_id = link.split('/')[-1]
-            scraped = self.check_if_already_scraped(friendly_id)
-            if scraped:
-                self.rank += 1
-                continue
-            else:
-                self.driver.get(link)
-                time.sleep(1)
-                self.new_id = str(uuid.uuid4())
-                self.create_current_track_data_dict()
-                self.find_track_artist()
-                self.find_track_title()
-                self.extract_track_info_to_dict()
-                self.find_artwork_link()
-                self.update_track_dict(link, friendly_id)
-                self.save_everything_accordingly() 
-                print('Scraped ', self.current_track_data['Track_Title'],'!')
-                self.rank += 1  # increment rank for next track
+        try:
+            for link in self.trackdict['Track_Link']:
+                friendly_id = link.split('/')[-1]
+                scraped = self.check_if_already_scraped(friendly_id)
+                if scraped:
+                    self.rank += 1
+                    continue
+                else:
+                    self.driver.get(link)
+                    time.sleep(1)
+                    self.new_id = str(uuid.uuid4())
+                    if self.archive:
+                        self.archive.append(link, self.driver.page_source,
+                            kind='track', UUID=self.new_id, Ranking=self.rank)
+                    self.create_current_track_data_dict()
+                    self.find_track_artist()
+                    self.find_track_title()
+                    self.extract_track_info_to_dict()
+                    self.find_artwork_link()
+                    self.update_track_dict(link, friendly_id)
+                    self.save_everything_accordingly() 
+                    print('Scraped ', self.current_track_data['Track_Title'],'!')
+                    self.rank += 1  # increment rank for next track
+        finally:
+            if self.low_memory:
+                self.trackdict['Track_Link'].close()
+                if self.store_locally:
+                    self.local_index.close()
         self.quit()
 
+class OfflineBeatportScraper(BeatportScraper):
+    '''
+    Scraper that extracts track data from a page saved in the raw_pages archive
+    It runs the same extraction methods as BeatportScraper without opening a browser
+    and can write the extracted data back to the store it was scraped to
+
+    Parameters
+    ----------
+    page_source: str
+        The HTML of the archived track website
+        If None, the scraper can only be used to write data back to the store
+    '''
+    def __init__(self, page_source: str = None):
+        if page_source is not None:
+            self.driver = ArchivedPage(page_source)
+
+    def extract_archived_track(self, entry: dict) -> dict:
+        '''
+        This method extracts the data of the archived track the same way scrape_data does
+
+        Parameters
+        ----------
+        entry: dict
+            The index entry of the archived page
+
+        Returns
+        -------
+        current_track_data: dict
+            The data extracted for the track
+        '''
+        link = entry['url']
+        self.new_id = entry.get('UUID', str(uuid.uuid4()))
+        self.rank = entry.get('Ranking')
+        self.create_current_track_data_dict()
+        self.find_track_artist()
+        self.find_track_title()
+        self.extract_track_info_to_dict()
+        self.find_artwork_link()
+        self.update_track_dict(link, link.split('/')[-1])
+        return self.current_track_data
+
+    def initialise_backfill(self, store_locally: bool) -> None:
+        '''
+        This method prepares the store that extracted data is written back to
+        For local mode it finds the folder of every track already saved, keyed by UUID
+        For online mode it connects to the RDS and checks if the track_data table exists.
+        Images are not uploaded again, so no S3 connection is made
+
+        Parameters
+        ----------
+        store_locally: bool
+            A boolean value denoting if data is to be written locally or to the RDS
+        '''
+        self.store_locally = store_locally
+        if store_locally:
+            self.parent_directory = self.create_track_folder()
+            self.track_folders = {}
+            for folder in os.scandir(self.parent_directory):
+                if folder.is_dir():
+                    with open(os.path.join(folder.path, 'data.json')) as f:
+                        self.track_folders[json.load(f)['UUID']] = folder.path
+        else:
+            self.engine = self.connect_engine()
+            self.table_exists = inspect(self.engine).has_table('track_data')
+
+    def backfill_track(self, current_track_data: dict) -> None:
+        '''
+        This method writes the data extracted for a track back to the store,
+        replacing the data saved before under the same UUID
+        In online mode the old row is deleted and the new one inserted in a single
+        transaction, so the row is never lost if the insert fails
+
+        Parameters
+        ----------
+        current_track_data: dict
+            The data extracted for the track
+        '''
+        if self.store_locally:
+            track_folder = self.track_folders.get(current_track_data['UUID'])
+            if track_folder is None:
+                track_folder = self.create_track_folder(current_track_data['Track_Title'])
+                self.track_folders[current_track_data['UUID']] = track_folder
+            self.save_data(track_folder, current_track_data)
+        else:
+            with self.engine.begin() as conn:
+                if self.table_exists:
+                    conn.execute(text('DELETE FROM track_data WHERE "UUID" = :uuid'),
+                        {'uuid': current_track_data['UUID']})
+                df = pd.DataFrame(current_track_data, index=[0])
+                df.to_sql('track_data', con=conn, if_exists='append', index=False)
+            self.table_exists = True
+
 print('====== Beatport Scraper Loaded ======')
 
 if __name__ == "__main__":
-    bot = BeatportScraper()
+    # LOW_MEMORY=1 keeps memory use flat for long crawls, e.g. in a container with a memory limit
+    bot = BeatportScraper(low_memory=os.environ.get('LOW_MEMORY', '').lower() in ('1', 'true', 'yes'))
     bot.scrape_data()
\ No newline at end of file
@@ -10,6 +10,6 @@ setup(
     author='Sophocles Sophocleous', 
     #license='MIT',
     packages=find_packages(), # This one is important to explain. See the notebook for a detailed explanation
-    install_requires=['webdriver_manager', 'selenium', 'sqlalchemy', 'boto3'], # For this project we are using two external libraries
+    install_requires=['webdriver_manager', 'selenium', 'sqlalchemy', 'boto3', 'lxml'], # For this project we are using two external libraries
                                                      # Make sure to include all external libraries in this argument
 )
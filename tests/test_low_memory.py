@@ -0,0 +1,152 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+import pandas as pd
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.exc import DBAPIError
+
+# See test_page_archive.py: the scraper folder is only on the path while its modules are imported
+SCRAPER_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scraper')
+sys.path.insert(0, SCRAPER_FOLDER)
+from low_memory import BloomFilter, LinkFrontier, LocalTrackIndex
+from scraper import BeatportScraper
+sys.path.remove(SCRAPER_FOLDER)
+for name in ('scraper', 'config'):
+    sys.modules.pop(name, None)
+
+class TestBloomFilter(unittest.TestCase):
+    def test_no_false_negatives(self):
+        bloom = BloomFilter(5000)
+        for i in range(5000):
+            bloom.add(f'track-{i}')
+        self.assertTrue(all(f'track-{i}' in bloom for i in range(5000)))
+
+    def test_false_positive_rate_near_error_rate(self):
+        bloom = BloomFilter(5000, error_rate=0.01)
+        for i in range(5000):
+            bloom.add(f'track-{i}')
+        false_positives = sum(f'other-{i}' in bloom for i in range(20000))
+        self.assertLess(false_positives / 20000, 0.02)
+
+    def test_zero_capacity(self):
+        bloom = BloomFilter(0)
+        self.assertNotIn('track', bloom)
+        bloom.add('track')
+        self.assertIn('track', bloom)
+
+class TestLinkFrontier(unittest.TestCase):
+    def setUp(self) -> None:
+        self.frontier = LinkFrontier()
+
+    def tearDown(self) -> None:
+        self.frontier.close()
+
+    def test_keeps_order_and_length(self):
+        links = [f'https://www.beatport.com/track/t/{i}' for i in range(100)]
+        for link in links:
+            self.frontier.append(link)
+        self.assertEqual(list(self.frontier), links)
+        self.assertEqual(len(self.frontier), 100)
+
+    def test_append_while_iterating(self):
+        self.frontier.append('a')
+        self.frontier.append('b')
+        visited = []
+        for link in self.frontier:
+            visited.append(link)
+            if link == 'a':
+                self.frontier.append('c')
+        self.assertEqual(visited, ['a', 'b', 'c'])
+
+class TestLowMemoryLocalStore(unittest.TestCase):
+    def setUp(self) -> None:
+        self.parent_directory = tempfile.mkdtemp()
+        for friendly_id, title in [('111', 'First Track'), ('222', 'Second Track')]:
+            folder = os.path.join(self.parent_directory, title)
+            os.mkdir(folder)
+            with open(os.path.join(folder, 'data.json'), 'w') as f:
+                json.dump({'Friendly_ID': friendly_id, 'Track_Title': title}, f)
+        self.bot = BeatportScraper.__new__(BeatportScraper)  # no browser needed
+        self.bot.low_memory = True
+        self.bot.store_locally = True
+        self.bot.parent_directory = self.parent_directory
+        self.bot.index_locally_scraped_tracks(self.parent_directory)
+
+    def tearDown(self) -> None:
+        self.bot.local_index.close()
+        shutil.rmtree(self.parent_directory)
+
+    def test_check_if_already_scraped(self):
+        self.assertTrue(self.bot.check_if_already_scraped('111'))
+        self.assertTrue(self.bot.check_if_already_scraped('222'))
+        self.assertFalse(self.bot.check_if_already_scraped('333'))
+
+    def test_confirmation_reads_index(self):
+        self.assertEqual(self.bot.find_scraped_track_title('111'), 'First Track')
+        self.assertIsNone(self.bot.find_scraped_track_title('333'))
+
+    def test_rebuild_drops_deleted_tracks(self):
+        shutil.rmtree(os.path.join(self.parent_directory, 'First Track'))
+        self.bot.local_index.close()
+        self.bot.index_locally_scraped_tracks(self.parent_directory)
+        self.assertIsNone(self.bot.find_scraped_track_title('111'))
+        self.assertFalse(self.bot.check_if_already_scraped('111'))
+        self.assertTrue(self.bot.check_if_already_scraped('222'))
+
+    def test_index_is_skipped_by_folder_scans(self):
+        self.assertTrue(os.path.exists(os.path.join(self.parent_directory, 'friendly_ids.sqlite')))
+        self.bot.find_locally_scraped_tracks(self.parent_directory)
+        self.assertEqual(sorted(self.bot.friendly_id_scraped_local), ['111', '222'])
+        self.bot.local_index.close()
+        self.bot.index_locally_scraped_tracks(self.parent_directory)
+        self.assertTrue(self.bot.check_if_already_scraped('111'))
+
+class TestLowMemoryOnlineStore(unittest.TestCase):
+    def setUp(self) -> None:
+        self.bot = BeatportScraper.__new__(BeatportScraper)  # no browser needed
+        self.bot.low_memory = True
+        self.bot.store_locally = False
+        self.bot.engine = create_engine('sqlite://')
+
+    def test_missing_table_is_first_time(self):
+        self.bot.index_online_scraped_tracks()
+        self.assertFalse(self.bot.check_if_already_scraped('111'))
+
+    def test_check_if_already_scraped(self):
+        pd.DataFrame({'Friendly_ID': ['111', '222'], 'Track_Title': ['First', 'Second']}).to_sql(
+            'track_data', con=self.bot.engine, index=False)
+        self.bot.index_online_scraped_tracks()
+        self.assertTrue(self.bot.check_if_already_scraped('222'))
+        self.assertFalse(self.bot.check_if_already_scraped('333'))
+        indexes = inspect(self.bot.engine).get_indexes('track_data')
+        self.assertIn(['Friendly_ID'], [index['column_names'] for index in indexes])
+        self.bot.index_online_scraped_tracks()  # index is only created once
+
+    def test_database_errors_propagate(self):
+        # track_data exists but cannot be read, as its underlying table was dropped
+        with self.bot.engine.begin() as conn:
+            conn.execute(text('CREATE TABLE tracks ("Friendly_ID" TEXT)'))
+            conn.execute(text('CREATE VIEW track_data AS SELECT * FROM tracks'))
+            conn.execute(text('DROP TABLE tracks'))
+        with self.assertRaises(DBAPIError):
+            self.bot.index_online_scraped_tracks()
+
+class TestLocalTrackIndex(unittest.TestCase):
+    def test_add_and_lookup_persist(self):
+        folder = tempfile.mkdtemp()
+        path = os.path.join(folder, 'friendly_ids.sqlite')
+        index = LocalTrackIndex(path)
+        index.add('111', 'Old Title')
+        index.add('111', 'New Title')
+        index.close()
+        index = LocalTrackIndex(path)
+        self.assertEqual(index.track_title('111'), 'New Title')
+        self.assertIsNone(index.track_title('222'))
+        index.close()
+        shutil.rmtree(folder)
+
+if __name__ == '__main__':
+    unittest.main()
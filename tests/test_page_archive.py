@@ -0,0 +1,141 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+import pandas as pd
+from selenium.webdriver.common.by import By
+from sqlalchemy import create_engine
+
+# The scraper modules import each other by name (e.g. `import config`) because they are
+# run as scripts from inside the scraper folder. The folder is only on the path while they
+# are imported, and scraper/scraper.py and config.py are then removed from sys.modules so
+# that `scraper` still names the package for the other test modules
+SCRAPER_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scraper')
+sys.path.insert(0, SCRAPER_FOLDER)
+import config
+from page_archive import ArchivedPage, PageArchive
+from reextract import extract_entry, reextract_archive
+from scraper import OfflineBeatportScraper
+sys.path.remove(SCRAPER_FOLDER)
+for name in ('scraper', 'config'):
+    sys.modules.pop(name, None)
+
+TRACK_PAGE = '''<html><head><title>Track</title><script>var x = "not text";</script></head>
+<body>
+<div class="interior-title"><h1>Nightfall</h1><h1 class="remixed">Extended   Mix</h1></div>
+<div class="interior-track-artists"><span class="category">Artists</span>
+    <span class="value">DJ One,
+        DJ Two</span></div>
+<ul class = "interior-track-content-list">
+    <li><span class="value">6:12</span></li>
+    <li><span class="value">2022-03-04</span></li>
+    <li><span class="value">124</span></li>
+    <li><span class="value">A min</span></li>
+    <li><span class="value">Techno</span></li>
+    <li><span class="value">Drumcode</span></li>
+</ul>
+<img class= "interior-track-release-artwork" src="https://geo-media.beatport.com/image/1.jpg">
+</body></html>'''
+
+class TestPageArchive(unittest.TestCase):
+    def setUp(self) -> None:
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.folder)
+
+    def test_round_trip_with_segment_rotation(self):
+        archive = PageArchive(self.folder, segment_size=300)
+        pages = [f'<html><body>page {i}\r\n\r\nafter blank line é</body></html>' * 5
+            for i in range(4)]
+        for i, page in enumerate(pages):
+            archive.append(f'https://www.beatport.com/track/t/{i}', page, kind='track', Ranking=i)
+        entries = list(archive.entries())
+        self.assertEqual([entry['Ranking'] for entry in entries], [0, 1, 2, 3])
+        self.assertGreater(len({entry['segment'] for entry in entries}), 1)
+        for entry, page in zip(entries, pages):
+            self.assertEqual(archive.read(entry), page)
+
+    def test_reading_does_not_create_folder(self):
+        missing = os.path.join(self.folder, 'missing')
+        with self.assertRaises(FileNotFoundError):
+            list(PageArchive(missing).entries())
+        with self.assertRaises(FileNotFoundError):
+            reextract_archive(missing, output=os.path.join(self.folder, 'out.jsonl'))
+        self.assertFalse(os.path.exists(missing))
+
+    def test_text_matches_selenium_rendering(self):
+        page = ArchivedPage('<html><body><div>One <b>two</b><script>no</script>'
+            '<span style="display: none">hidden</span><p>three\n   four</p>five<br>six'
+            '</div></body></html>')
+        self.assertEqual(page.find_element(By.TAG_NAME, 'div').text,
+            'One two\nthree four\nfive\nsix')
+
+    def test_extract_archived_track(self):
+        entry = {'url': 'https://www.beatport.com/track/nightfall/123', 'UUID': 'abc',
+            'Ranking': 7}
+        data = OfflineBeatportScraper(TRACK_PAGE).extract_archived_track(entry)
+        self.assertEqual(data['Track_Title'], 'Nightfall Extended Mix')
+        self.assertEqual(data['Artist'], 'DJ One, DJ Two')
+        self.assertEqual([data[value] for value in OfflineBeatportScraper.mapping_dict.values()],
+            ['6:12', '2022-03-04', '124', 'A min', 'Techno', 'Drumcode'])
+        self.assertEqual(data['Artwork_Link'], 'https://geo-media.beatport.com/image/1.jpg')
+        self.assertEqual((data['UUID'], data['Ranking'], data['Friendly_ID']), ('abc', 7, '123'))
+
+    def test_extract_entry_returns_error(self):
+        archive = PageArchive(self.folder)
+        entry = archive.append('https://www.beatport.com/track/empty/1',
+            '<html><body></body></html>', kind='track')
+        result_entry, data, error = extract_entry(self.folder, entry)
+        self.assertEqual(result_entry, entry)
+        self.assertIsNone(data)
+        self.assertIn('NoSuchElementException', error)
+
+    def test_reextract_skips_top_100_and_backfills_local_store(self):
+        archive = PageArchive(os.path.join(self.folder, 'raw_pages'))
+        archive.append(config.URL + 'top-100', '<html><body></body></html>', kind='top_100')
+        archive.append('https://www.beatport.com/track/nightfall/123', TRACK_PAGE,
+            kind='track', UUID='abc', Ranking=1)
+        track_folder = os.path.join(self.folder, 'raw_data', 'Old Title')
+        os.makedirs(track_folder)
+        with open(os.path.join(track_folder, 'data.json'), 'w') as f:
+            json.dump({'UUID': 'abc', 'Friendly_ID': '123', 'Track_Title': 'Old Title'}, f)
+        cwd = os.getcwd()
+        os.chdir(self.folder)
+        try:
+            count = reextract_archive('raw_pages', store='local', workers=1)
+        finally:
+            os.chdir(cwd)
+        self.assertEqual(count, 1)
+        with open(os.path.join(track_folder, 'data.json')) as f:
+            self.assertEqual(json.load(f)['Track_Title'], 'Nightfall Extended Mix')
+
+    def test_reextract_backfills_rds(self):
+        archive = PageArchive(self.folder)
+        archive.append('https://www.beatport.com/track/nightfall/123', TRACK_PAGE,
+            kind='track', UUID='abc', Ranking=1)
+        engine = create_engine('sqlite://')
+        with mock.patch.object(OfflineBeatportScraper, 'connect_engine', return_value=engine):
+            self.assertEqual(reextract_archive(self.folder, store='rds', workers=1), 1)
+            self.assertEqual(reextract_archive(self.folder, store='rds', workers=1), 1)
+        df = pd.read_sql('SELECT * FROM track_data', engine)
+        self.assertEqual(list(df['UUID']), ['abc'])
+        self.assertEqual(list(df['Track_Title']), ['Nightfall Extended Mix'])
+
+    def test_rds_backfill_keeps_row_if_insert_fails(self):
+        engine = create_engine('sqlite://')
+        pd.DataFrame({'UUID': ['abc'], 'Track_Title': ['Old Title']}).to_sql(
+            'track_data', con=engine, index=False)
+        backfill = OfflineBeatportScraper()
+        with mock.patch.object(OfflineBeatportScraper, 'connect_engine', return_value=engine):
+            backfill.initialise_backfill(store_locally=False)
+        with self.assertRaises(Exception):  # column missing from the table
+            backfill.backfill_track({'UUID': 'abc', 'Track_Title': 'New', 'Unknown': 'x'})
+        df = pd.read_sql('SELECT * FROM track_data', engine)
+        self.assertEqual(list(df['Track_Title']), ['Old Title'])
+
+if __name__ == '__main__':
+    unittest.main()